@@ -3,7 +3,22 @@ from __future__ import annotations
 from pathlib import Path
 from fastmcp import FastMCP
 import os
+import re
+import bisect
+import codecs
+import functools
+import heapq
 import ast
+import shutil
+import subprocess
+import hashlib
+import importlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
 
 # 1️⃣ Create the MCP server FIRST
 mcp = FastMCP("intel-fs")
@@ -11,6 +26,45 @@ mcp = FastMCP("intel-fs")
 # 2️⃣ Define sandbox base directory
 #BASE_DIR = Path.cwd().resolve()
 BASE_DIR = Path(os.environ.get("MCP_BASE_DIR", Path.cwd())).resolve()
+# String forms for cheap sandbox checks (no Path objects per call)
+_BASE_STR = str(BASE_DIR)
+_BASE_PREFIX = _BASE_STR if _BASE_STR.endswith(os.sep) else _BASE_STR + os.sep
+
+# Persistent cache of _summarize_python_ast results, keyed by (path, content hash).
+# Bump the version whenever the summary format changes.
+AST_CACHE_PATH = BASE_DIR / ".intel_fs_cache.db"
+# The cache and its WAL side files live in the sandbox but aren't repo content
+_AST_CACHE_FILES = frozenset(AST_CACHE_PATH.name + s for s in ("", "-wal", "-shm", "-journal"))
+_AST_CACHE_VERSION = 5
+_ast_cache_conn = None
+_ast_cache_lock = threading.Lock()
+
+# Text-like files scanned by the smart_search Python fallback; you can expand later
+_TEXT_EXTS = frozenset({".py", ".md", ".txt", ".toml", ".yaml", ".yml", ".json", ".env", ".ini", ".cfg"})
+
+# Common entrypoints reported by explain_repository
+_ENTRY_SUFFIXES = ("main.py", "__main__.py")
+_ENTRY_NAMES = frozenset({"app.py", "server.py"})
+
+# optional: C-speed parsing for explain_repository; loaded on first use (the
+# grammar load costs tens of ms at startup), falls back to ast
+_ts_get_parser = None
+_ts_checked = False
+_ts_error = None  # why an installed tree-sitter couldn't be used, if it failed
+_ts_local = threading.local()  # tree-sitter parsers aren't thread-safe: one per worker
+
+
+@functools.lru_cache(maxsize=None)
+def _optional_module(name: str):
+    """
+    Import an optional dependency on first use (blake3, hyperscan, re2), so only the
+    code paths that need one pay for loading it. Returns None if it isn't installed.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
 
 # 3️⃣ Define tools AFTER mcp exists
 @mcp.tool
@@ -18,6 +72,42 @@ def ping() -> dict:
     """Test tool to verify Claude Desktop can call our MCP server."""
     return {"ok": True, "message": "pong"}
 
+
+def _safe_resolve(rel_path: str) -> str:
+    """Resolve a relative path under BASE_DIR with sandbox protection."""
+    if rel_path.startswith("~") or rel_path.startswith("/"):
+        raise ValueError("InvalidPath: use a relative path.")
+    joined = os.path.join(_BASE_STR, rel_path)
+    # Lexical check first: '../' escapes are rejected with string ops alone
+    lexical = os.path.normpath(joined)
+    if lexical != _BASE_STR and not lexical.startswith(_BASE_PREFIX):
+        raise PermissionError("SecurityError: path escapes sandbox.")
+    # realpath runs on every call: a symlink inside BASE_DIR may point outside it,
+    # and one can appear or change between calls
+    p = os.path.realpath(joined)
+    if p != _BASE_STR and not p.startswith(_BASE_PREFIX):
+        raise PermissionError("SecurityError: path escapes sandbox.")
+    return p
+
+
+def _scandir_rec(top: str):
+    """
+    Yield DirEntry objects for every regular file under `top`.
+    Iterative os.scandir walk: DirEntry caches the file type, so no extra stat per entry.
+    Symlinked directories are not followed; the AST cache files are skipped.
+    """
+    stack = [top]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and entry.name not in _AST_CACHE_FILES:
+                        yield entry
+        except OSError:
+            continue
+
 @mcp.tool
 def list_files(root: str = ".", max_results: int = 200) -> dict:
     """
@@ -32,17 +122,17 @@ def list_files(root: str = ".", max_results: int = 200) -> dict:
                 "message": "Use a relative path like '.' or 'src'.",
             }
 
-        root_path = (BASE_DIR / root).resolve()
-
         # Prevent escaping BASE_DIR
-        if BASE_DIR != root_path and BASE_DIR not in root_path.parents:
+        try:
+            root_path = _safe_resolve(root)
+        except PermissionError:
             return {
                 "ok": False,
                 "error": "SecurityError",
                 "message": "Path escapes the sandbox base directory.",
             }
 
-        if not root_path.exists() or not root_path.is_dir():
+        if not os.path.isdir(root_path):
             return {
                 "ok": False,
                 "error": "NotFound",
@@ -50,11 +140,12 @@ def list_files(root: str = ".", max_results: int = 200) -> dict:
             }
 
         files = []
-        for p in root_path.rglob("*"):
-            if p.is_file():
-                files.append(str(p.relative_to(BASE_DIR)))
-                if len(files) >= max_results:
-                    break
+        # every walked path starts with _BASE_PREFIX, so slicing gives the relative path
+        cut = len(_BASE_PREFIX)
+        for entry in _scandir_rec(root_path):
+            files.append(entry.path[cut:])
+            if len(files) >= max_results:
+                break
 
         return {
             "ok": True,
@@ -68,14 +159,49 @@ def list_files(root: str = ".", max_results: int = 200) -> dict:
         return {"ok": False, "error": type(e).__name__, "message": str(e)}
 
 
+def _read_text_chunk(fp: str, max_chars: int, offset: int = 0) -> tuple[str, bool, int]:
+    """
+    Read at most `max_chars` characters of a UTF-8 file starting at byte `offset`,
+    without loading the rest. Returns (text, truncated, next byte offset).
+    The next offset always lands on a character boundary, so paging neither drops
+    nor repeats text (invalid bytes are skipped, as with errors="ignore").
+    """
+    max_bytes = max_chars * 4  # UTF-8 is at most 4 bytes per char
+    with open(fp, "rb") as f:
+        f.seek(offset)
+        raw = f.read(max_bytes)
+        size = os.fstat(f.fileno()).st_size
+
+    # An incremental decoder holds back a trailing incomplete character instead of
+    # dropping it; those bytes are left for the next page.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    text = decoder.decode(raw, final=offset + len(raw) >= size)
+    consumed = len(raw) - len(decoder.getstate()[0])
+
+    if len(text) > max_chars:
+        # smallest byte prefix that decodes to max_chars characters
+        lo, hi = 1, consumed
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if len(raw[:mid].decode("utf-8", errors="ignore")) >= max_chars:
+                hi = mid
+            else:
+                lo = mid + 1
+        return text[:max_chars], True, offset + lo
+
+    end = offset + consumed
+    return text, size > end, end
+
+
 @mcp.tool
-def read_file(path: str, max_chars: int = 20000) -> dict:
+def read_file(path: str, max_chars: int = 20000, offset: int = 0) -> dict:
     """
     Read a text file inside the sandbox (BASE_DIR).
     Safety:
     - only relative paths
     - prevents ../ escaping
     - caps returned content size
+    Large files can be read in pieces: pass the returned next_offset back as offset.
     """
     try:
         if path.startswith("~") or path.startswith("/"):
@@ -85,104 +211,382 @@ def read_file(path: str, max_chars: int = 20000) -> dict:
                 "message": "Use a relative path like 'README.md' or 'src/intel_fs/server.py'.",
             }
 
-        fp = (BASE_DIR / path).resolve()
-
         # Prevent escaping BASE_DIR
-        if BASE_DIR != fp and BASE_DIR not in fp.parents:
+        try:
+            fp = _safe_resolve(path)
+        except PermissionError:
             return {
                 "ok": False,
                 "error": "SecurityError",
                 "message": "Path escapes the sandbox base directory.",
             }
 
-        if not fp.exists() or not fp.is_file():
+        if not os.path.isfile(fp):
             return {
                 "ok": False,
                 "error": "NotFound",
                 "message": f"File not found: {path}",
             }
 
-        text = fp.read_text(encoding="utf-8", errors="ignore")
-        truncated = len(text) > max_chars
+        if max_chars <= 0:
+            return {
+                "ok": False,
+                "error": "InvalidArgument",
+                "message": "max_chars must be a positive number.",
+            }
+
+        offset = max(offset, 0)
+        text, truncated, next_offset = _read_text_chunk(fp, max_chars, offset)
 
         return {
             "ok": True,
-            "path": str(fp.relative_to(BASE_DIR)),
+            "path": fp[len(_BASE_PREFIX):],
             "truncated": truncated,
-            "content": text[:max_chars],
+            "content": text,
+            "offset": offset,
+            "next_offset": next_offset if truncated else None,
         }
 
     except Exception as e:
         return {"ok": False, "error": type(e).__name__, "message": str(e)}
 
 
-def _summarize_python_ast(text: str) -> dict:
-    """Extract lightweight structure from Python code using AST."""
+# keep outputs bounded
+_SUMMARY_CAPS = {"functions": 60, "classes": 40, "imports": 80}
+
+
+class _Stop(Exception):
+    """Raised to end a summary walk once every output list is full."""
+
+
+def _add_capped(out: dict, key: str, names) -> bool:
+    """Append names to out[key] up to its cap. Returns True once all lists are full."""
+    bucket, cap = out[key], _SUMMARY_CAPS[key]
+    for name in names:
+        if len(bucket) >= cap:
+            break
+        bucket.append(name)
+    return all(len(out[k]) >= c for k, c in _SUMMARY_CAPS.items())
+
+
+class _Summarizer(ast.NodeVisitor):
+    """
+    Collect function/class names and imports without descending into
+    function or class bodies (nested defs aren't useful for a repo overview).
+    Statements under module-level if/try/with/for/match blocks are still visited,
+    but expressions never are. Raises _Stop once every output list has reached its cap.
+    """
+
+    # the only fields generic_visit follows: nested statement lists
+    _STMT_FIELDS = ("body", "handlers", "orelse", "finalbody", "cases")
+
+    def __init__(self, out: dict):
+        self.out = out
+
+    def _add(self, key: str, names):
+        if _add_capped(self.out, key, names):
+            raise _Stop
+
+    def visit_FunctionDef(self, node):
+        self._add("functions", (node.name,))  # no generic_visit: skip the body
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self._add("classes", (node.name,))
+
+    def visit_Import(self, node):
+        self._add("imports", (n.name for n in node.names))
+
+    def visit_ImportFrom(self, node):
+        mod = node.module or ""
+        self._add("imports", (f"{mod}.{n.name}" if mod else n.name for n in node.names))
+
+    def generic_visit(self, node):
+        for field in self._STMT_FIELDS:
+            for child in getattr(node, field, ()):
+                self.visit(child)
+
+
+_TS_DEFS = {"function_definition": "functions", "class_definition": "classes"}
+_TS_CONTAINERS = {
+    "if_statement", "elif_clause", "else_clause", "try_statement", "except_clause",
+    "finally_clause", "with_statement", "for_statement", "while_statement", "block",
+    "except_group_clause", "match_statement", "case_clause",
+}
+
+
+def _load_tree_sitter():
+    """Import tree_sitter_languages on first call. Returns get_parser, or None if unavailable."""
+    global _ts_get_parser, _ts_checked, _ts_error
+    if not _ts_checked:
+        try:
+            from tree_sitter_languages import get_parser
+        except ImportError:
+            get_parser = None  # not installed: ast is the intended backend
+        if get_parser is not None:
+            try:
+                get_parser("python")
+                _ts_get_parser = get_parser
+            except Exception as e:
+                # installed but broken (e.g. tree-sitter>=0.22 dropped Language(path, name))
+                _ts_error = f"{type(e).__name__}: {e}"
+                logger.warning("tree-sitter unavailable, falling back to ast: %s", _ts_error)
+        _ts_checked = True
+    return _ts_get_parser
+
+
+def _ts_parser():
+    parser = getattr(_ts_local, "parser", None)
+    if parser is None:
+        parser = _ts_local.parser = _ts_get_parser("python")
+    return parser
+
+
+def _ts_import_names(node) -> list[str]:
+    names = []
+    for n in node.children_by_field_name("name"):
+        if n.type == "aliased_import":
+            n = n.child_by_field_name("name")
+        names.append(n.text.decode("utf-8", errors="ignore"))
+    if node.type == "future_import_statement":
+        names = [f"__future__.{n}" for n in names]
+    elif node.type == "import_from_statement":
+        if any(c.type == "wildcard_import" for c in node.children):
+            names.append("*")
+        mod_node = node.child_by_field_name("module_name")
+        # match ast: relative dots are dropped from the module name
+        mod = mod_node.text.decode("utf-8", errors="ignore").lstrip(".") if mod_node else ""
+        names = [f"{mod}.{n}" if mod else n for n in names]
+    return names
+
+
+def _summarize_tree_sitter(source: bytes) -> dict:
+    """Same output as the ast path, using tree-sitter's C parser."""
     out = {"functions": [], "classes": [], "imports": [], "error": None}
+    tree = _ts_parser().parse(source)
+    stack = list(reversed(tree.root_node.children))
+    while stack:
+        node = stack.pop()
+        if node.type == "decorated_definition":
+            node = node.child_by_field_name("definition")
+        if node.type in _TS_DEFS:
+            name = node.child_by_field_name("name")
+            if name is not None and _add_capped(
+                out, _TS_DEFS[node.type], (name.text.decode("utf-8", errors="ignore"),)
+            ):
+                break
+        elif node.type in ("import_statement", "import_from_statement", "future_import_statement"):
+            if _add_capped(out, "imports", _ts_import_names(node)):
+                break
+        elif node.type in _TS_CONTAINERS:
+            stack.extend(reversed(node.children))
+
+    if tree.root_node.has_error:
+        out["error"] = "SyntaxError: tree-sitter reported parse errors"
+    return out
+
+
+# a line that starts a top-level statement (not indented, a comment or a closing bracket)
+_TOPLEVEL_LINE = re.compile(rb"^[^\s#)\]}]", re.M)
+
+
+def _summarize_python_ast(source: bytes, truncated: bool = False) -> dict:
+    """
+    Extract lightweight structure from Python source bytes (tree-sitter if installed, else AST).
+    Both parsers take bytes directly, so the file is never decoded to str.
+    `truncated` marks source cut off by a read cap. The last top-level statement is then
+    dropped before parsing (it is usually incomplete) so both backends see the same
+    complete statements, and the cut is reported in "error".
+    """
+    out = {"functions": [], "classes": [], "imports": [], "error": None}
+    if truncated:
+        cut = 0
+        for m in _TOPLEVEL_LINE.finditer(source):
+            cut = m.start()
+        size, source = len(source), source[:cut]
     try:
-        tree = ast.parse(text)
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                out["functions"].append(node.name)
-            elif isinstance(node, ast.ClassDef):
-                out["classes"].append(node.name)
-            elif isinstance(node, ast.Import):
-                for n in node.names:
-                    out["imports"].append(n.name)
-            elif isinstance(node, ast.ImportFrom):
-                mod = node.module or ""
-                for n in node.names:
-                    out["imports"].append(f"{mod}.{n.name}" if mod else n.name)
-
-        # keep outputs bounded
-        out["functions"] = out["functions"][:60]
-        out["classes"] = out["classes"][:40]
-        out["imports"] = out["imports"][:80]
-        return out
+        if _load_tree_sitter():
+            out = _summarize_tree_sitter(source)
+        else:
+            try:
+                tree = ast.parse(source)
+            except SyntaxError:
+                # parsing bytes decodes strictly: retry like the old str path, dropping bad
+                # bytes, but only if decoding is what failed (not for plain syntax errors)
+                try:
+                    source.decode("utf-8")
+                except UnicodeDecodeError:
+                    tree = ast.parse(source.decode("utf-8", errors="ignore"))
+                else:
+                    raise
+            try:
+                _Summarizer(out).visit(tree)
+            except _Stop:
+                pass
     except Exception as e:
         out["error"] = str(e)
         return out
+    if truncated:
+        out["error"] = f"Truncated: only the first {size} bytes were read"
+    return out
+
+
+def _content_hash(data: bytes) -> str:
+    """Hash file content for the AST cache key (blake3 if installed, else sha256)."""
+    blake3 = _optional_module("blake3")  # faster than sha256
+    h = blake3.blake3(data).hexdigest() if blake3 else hashlib.sha256(data).hexdigest()
+    backend = "tree-sitter" if _load_tree_sitter() else "ast"
+    return f"v{_AST_CACHE_VERSION}-{backend}:{h}"
+
+
+def _get_ast_cache():
+    """Open the AST cache on first use. Returns None if the database can't be created."""
+    global _ast_cache_conn
+    if _ast_cache_conn is not None:
+        return _ast_cache_conn
+    with _ast_cache_lock:  # worker threads may race here on a cold start
+        if _ast_cache_conn is not None:
+            return _ast_cache_conn
+        import sqlite3  # deferred: only explain_repository needs it
+
+        conn = None
+        try:
+            conn = sqlite3.connect(str(AST_CACHE_PATH), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ast_cache("
+                "path TEXT, sha TEXT, json BLOB, PRIMARY KEY(path, sha))"
+            )
+            conn.commit()
+            _ast_cache_conn = conn
+        except sqlite3.Error:
+            if conn is not None:
+                conn.close()
+            return None
+        return _ast_cache_conn
+
+
+def _ast_cache_get(rel: str, sha: str) -> dict | None:
+    conn = _get_ast_cache()
+    if conn is None:
+        return None
+    try:
+        with _ast_cache_lock:
+            row = conn.execute(
+                "SELECT json FROM ast_cache WHERE path=? AND sha=?", (rel, sha)
+            ).fetchone()
+    except Exception:  # sqlite3.Error; a cache failure is never fatal
+        return None
+    return json.loads(row[0]) if row else None
+
+
+def _ast_cache_put_many(rows: list[tuple[str, str, str]]) -> None:
+    conn = _get_ast_cache()
+    if conn is None or not rows:
+        return
+    try:
+        with _ast_cache_lock:
+            # a changed file gets a new sha: drop its old rows so the db doesn't grow forever
+            conn.executemany(
+                "DELETE FROM ast_cache WHERE path=? AND sha<>?", [(rel, sha) for rel, sha, _ in rows]
+            )
+            conn.executemany("INSERT OR REPLACE INTO ast_cache(path, sha, json) VALUES (?, ?, ?)", rows)
+            conn.commit()
+    except Exception:  # sqlite3.Error
+        pass
+
+def _head_lines(data: bytes, n: int) -> bytes:
+    """First n lines of data, found with bytes.find instead of splitting every line."""
+    i = -1
+    for _ in range(n):
+        j = data.find(b"\n", i + 1)
+        if j == -1:
+            return data[:-1] if data.endswith(b"\n") else data
+        i = j
+    return data[:i]
+
 
 @mcp.tool
 def explain_repository(root: str = ".", max_files: int = 60, max_chars_per_file: int = 12000) -> dict:
     """
     Create a Copilot-style structured overview of a Python repository.
     The LLM uses this output to explain what the repo does, main modules, and flow.
+    max_chars_per_file caps the bytes read from each file (equal to characters for ASCII source).
+    Summaries of files cut off by the cap say so in their "error" field.
     """
     try:
         if root.startswith("~") or root.startswith("/"):
             return {"ok": False, "error": "InvalidPath", "message": "Use a relative path like '.' or 'src'."}
 
-        root_path = (BASE_DIR / root).resolve()
-        if BASE_DIR != root_path and BASE_DIR not in root_path.parents:
+        try:
+            root_path = _safe_resolve(root)
+        except PermissionError:
             return {"ok": False, "error": "SecurityError", "message": "Root escapes the sandbox base directory."}
-        if not root_path.exists() or not root_path.is_dir():
+        if not os.path.isdir(root_path):
             return {"ok": False, "error": "NotFound", "message": f"Folder not found: {root}"}
 
-        py_files = sorted([p for p in root_path.rglob("*.py") if p.is_file()])[:max_files]
-
         summaries = []
         entry_candidates = []
+        cache_misses = []
 
-        for fp in py_files:
-            rel = str(fp.relative_to(BASE_DIR))
-
-            # common entrypoints
-            low = rel.lower()
-            if low.endswith(("main.py", "__main__.py")) or low in ("app.py", "server.py"):
-                entry_candidates.append(rel)
-
-            text = fp.read_text(encoding="utf-8", errors="ignore")[:max_chars_per_file]
-            summaries.append({
-                "path": rel,
-                "structure": _summarize_python_ast(text),
-                "preview": "\n".join(text.splitlines()[:30])
-            })
+        def _py_paths():
+            for entry in _scandir_rec(root_path):
+                if not entry.name.endswith(".py"):
+                    continue
+                # common entrypoints, detected during the same walk
+                low = entry.name.lower()
+                if low.endswith(_ENTRY_SUFFIXES) or low in _ENTRY_NAMES:
+                    entry_candidates.append(entry.path[len(_BASE_PREFIX):])
+                yield entry.path
+
+        # Only the first max_files paths are needed: O(N log max_files) instead of a full sort
+        py_files = heapq.nsmallest(max_files, _py_paths(), key=str.lower)
+        entry_candidates.sort()
+
+        def _process(fp: str):
+            # Runs in a worker thread. File reads, hashing and cache lookups overlap across
+            # threads; the parse itself holds the GIL, so misses still parse one at a time.
+            rel = fp[len(_BASE_PREFIX):]
+            # Python source is overwhelmingly ASCII, so bytes ~= chars for the cap
+            with open(fp, "rb") as f:
+                raw = f.read(max_chars_per_file + 1)
+            # the extra byte shows whether the cap cut the file; hashing it keys that in too
+            sha = _content_hash(raw)
+            truncated = len(raw) > max_chars_per_file
+            raw = raw[:max_chars_per_file]
+            structure = _ast_cache_get(rel, sha)
+            miss = None
+            if structure is None:
+                structure = _summarize_python_ast(raw, truncated)
+                miss = (rel, sha, json.dumps(structure))
+            # CRLF -> LF on the 30-line slice only (the last line's \r has no \n left after it)
+            head = _head_lines(raw, 30).replace(b"\r\n", b"\n").removesuffix(b"\r")
+            preview = head.decode("utf-8", errors="ignore")
+            return rel, structure, preview, miss
+
+        _get_ast_cache()  # open once here, not from inside the pool
+        workers = max(1, min(32, (os.cpu_count() or 1) * 4, len(py_files)))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for rel, structure, preview, miss in ex.map(_process, py_files):
+                if miss is not None:
+                    cache_misses.append(miss)
+                summaries.append({
+                    "path": rel,
+                    "structure": structure,
+                    "preview": preview
+                })
+
+        _ast_cache_put_many(cache_misses)
 
         # also include a small tree (top-level only)
         top_level = []
-        for p in root_path.iterdir():
-            top_level.append({"name": p.name, "type": "dir" if p.is_dir() else "file"})
+        with os.scandir(root_path) as it:
+            for p in it:
+                if p.name in _AST_CACHE_FILES:
+                    continue
+                top_level.append({"name": p.name, "type": "dir" if p.is_dir() else "file"})
         top_level = sorted(top_level, key=lambda x: (x["type"], x["name"]))
 
         return {
@@ -190,6 +594,8 @@ def explain_repository(root: str = ".", max_files: int = 60, max_chars_per_file:
             "base_dir": str(BASE_DIR),
             "root": root,
             "python_files_scanned": len(py_files),
+            "parser": "tree-sitter" if _load_tree_sitter() else "ast",
+            "parser_error": _ts_error,
             "entry_point_candidates": entry_candidates[:10],
             "top_level": top_level[:200],
             "file_summaries": summaries
@@ -197,16 +603,96 @@ def explain_repository(root: str = ".", max_files: int = 60, max_chars_per_file:
 
     except Exception as e:
         return {"ok": False, "error": type(e).__name__, "message": str(e)}
-    
 
-def _safe_resolve(rel_path: str) -> Path:
-    """Resolve a relative path under BASE_DIR with sandbox protection."""
-    if rel_path.startswith("~") or rel_path.startswith("/"):
-        raise ValueError("InvalidPath: use a relative path.")
-    p = (BASE_DIR / rel_path).resolve()
-    if p != BASE_DIR and BASE_DIR not in p.parents:
-        raise PermissionError("SecurityError: path escapes sandbox.")
-    return p
+
+@functools.lru_cache(maxsize=64)
+def _hyperscan_db(query: str, case_sensitive: bool):
+    """Compile a literal query into a hyperscan database, or None if it can't be compiled."""
+    hyperscan = _optional_module("hyperscan")  # SIMD literal scanning
+    db = hyperscan.Database()
+    try:
+        db.compile(
+            expressions=[re.escape(query).encode("utf-8")],
+            ids=[0],
+            flags=[0 if case_sensitive else hyperscan.HS_FLAG_CASELESS],
+        )
+    except hyperscan.error:
+        return None  # e.g. an empty query, which hyperscan rejects
+    return db
+
+
+_hyperscan_lock = threading.Lock()  # databases share one scratch space
+
+
+@functools.lru_cache(maxsize=256)
+def _fallback_pattern(query: str, use_regex: bool, case_sensitive: bool):
+    """Compile the query for the line-by-line scan, using re2 for regexes when installed."""
+    re2 = _optional_module("re2") if use_regex else None  # linear-time regex
+    if re2 is not None:
+        try:
+            return re2.compile(query if case_sensitive else f"(?i){query}"), "re2"
+        except Exception:
+            pass  # syntax re2 doesn't support (e.g. backreferences)
+    flags = 0 if case_sensitive else re.IGNORECASE
+    return re.compile(query if use_regex else re.escape(query), flags=flags), "python"
+
+
+def _lines_at_offsets(data: bytes, offsets):
+    """Yield (line number, line text) for each distinct line containing one of the byte offsets."""
+    if not offsets:
+        return  # most scanned files have no hit: don't index their newlines
+    newlines = [m.start() for m in re.finditer(b"\n", data)]
+    last = -1
+    for off in sorted(offsets):
+        k = bisect.bisect_left(newlines, off)
+        if k == last:
+            continue
+        last = k
+        start = newlines[k - 1] + 1 if k else 0
+        end = newlines[k] if k < len(newlines) else len(data)
+        yield k + 1, data[start:end].decode("utf-8", errors="ignore")
+
+
+def _iter_lines_hyperscan(path: str, db):
+    with open(path, "rb") as f:
+        data = f.read()
+    ends = []
+
+    def on_match(_id, _from, to, _flags, _ctx):
+        ends.append(to - 1)  # last byte of the match
+
+    with _hyperscan_lock:
+        db.scan(data, match_event_handler=on_match)
+    yield from _lines_at_offsets(data, ends)
+
+
+def _iter_lines_literal(path: str, needle: bytes, case_sensitive: bool):
+    """Find an ASCII-foldable literal with bytes.find over an mmap of the file."""
+    import mmap  # deferred: only the literal search fallback needs it
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # mmap can't map empty files
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm if case_sensitive else mm[:].lower()
+            offsets = []
+            pos = data.find(needle)
+            while pos != -1:
+                offsets.append(pos)
+                eol = data.find(b"\n", pos)
+                if eol == -1 or eol + 1 == len(data):
+                    break  # no further line (an empty query would match past the final newline)
+                pos = data.find(needle, eol + 1)  # one hit per line is enough
+            # lower() keeps byte offsets, so report lines from the original bytes
+            yield from _lines_at_offsets(mm, offsets)
+
+
+def _iter_lines_pattern(path: str, pattern):
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for i, line in enumerate(f, start=1):
+            if pattern.search(line):
+                yield i, line
+
 
 @mcp.tool
 def smart_search(
@@ -225,7 +711,7 @@ def smart_search(
     """
     try:
         root_path = _safe_resolve(root)
-        if not root_path.exists() or not root_path.is_dir():
+        if not os.path.isdir(root_path):
             return {"ok": False, "error": "NotFound", "message": f"Folder not found: {root}"}
 
         # Prefer ripgrep if installed
@@ -239,30 +725,47 @@ def smart_search(
 
             # Don't search huge binaries; keep it friendly
             rg_args += ["--max-filesize", f"{max_file_size_kb}K"]
+            # rg stops reading a file after this many matching lines
+            rg_args += ["--max-count", str(max_hits)]
 
             rg_args += [query, "."]
 
-            proc = subprocess.run(
+            # Stream results and stop rg as soon as we have enough hits
+            proc = subprocess.Popen(
                 rg_args,
-                cwd=str(root_path),
-                capture_output=True,
+                cwd=root_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
                 text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
             )
 
             hits = []
-            for line in proc.stdout.splitlines():
-                parts = line.split(":", 2)  # file:line:text
-                if len(parts) == 3:
-                    pth, ln, txt = parts
-                    hits.append(
-                        {
-                            "path": str((Path(root) / pth).as_posix()),
-                            "line": int(ln),
-                            "text": txt.strip(),
-                        }
-                    )
-                    if len(hits) >= max_hits:
-                        break
+            try:
+                for line in proc.stdout:
+                    parts = line.split(":", 2)  # file:line:text
+                    if len(parts) == 3:
+                        pth, ln, txt = parts
+                        hits.append(
+                            {
+                                "path": str((Path(root) / pth).as_posix()),
+                                "line": int(ln),
+                                "text": txt.strip(),
+                            }
+                        )
+                        if len(hits) >= max_hits:
+                            break
+            finally:
+                if proc.poll() is None:
+                    proc.terminate()
+                proc.stdout.close()
+                try:
+                    proc.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.wait()
 
             return {
                 "ok": True,
@@ -273,52 +776,64 @@ def smart_search(
                 "truncated": len(hits) >= max_hits,
             }
 
-        # Python fallback
-        flags = 0 if case_sensitive else re.IGNORECASE
-        pattern = re.compile(query if use_regex else re.escape(query), flags=flags)
+        # Python fallback: hyperscan for literals, re2 for regexes, else re
+        # HS_FLAG_CASELESS only folds ASCII, same as bytes.lower(); other case-insensitive
+        # literals go through re for Unicode case folding
+        ascii_foldable = case_sensitive or query.isascii()
+        hs_db = None
+        if not use_regex and ascii_foldable and _optional_module("hyperscan"):
+            hs_db = _hyperscan_db(query, case_sensitive)
+        needle = None
+        if hs_db is not None:
+            engine = "hyperscan"
+        elif not use_regex and ascii_foldable:
+            needle = query.encode("utf-8") if case_sensitive else query.encode("utf-8").lower()
+            engine = "python"
+        else:
+            pattern, engine = _fallback_pattern(query, use_regex, case_sensitive)
 
         hits = []
-        # Scan common text-like files; you can expand later
-        exts = {".py", ".md", ".txt", ".toml", ".yaml", ".yml", ".json", ".env", ".ini", ".cfg"}
 
-        for fp in root_path.rglob("*"):
-            if not fp.is_file():
-                continue
-            if fp.suffix.lower() not in exts:
+        for entry in _scandir_rec(root_path):
+            if os.path.splitext(entry.name)[1].lower() not in _TEXT_EXTS:
                 continue
             # Skip very large files
             try:
-                if fp.stat().st_size > max_file_size_kb * 1024:
+                if entry.stat().st_size > max_file_size_kb * 1024:
                     continue
             except Exception:
                 continue
 
             try:
-                with fp.open("r", encoding="utf-8", errors="ignore") as f:
-                    for i, line in enumerate(f, start=1):
-                        if pattern.search(line):
-                            hits.append(
-                                {
-                                    "path": str(fp.relative_to(BASE_DIR).as_posix()),
-                                    "line": i,
-                                    "text": line.strip(),
-                                }
-                            )
-                            if len(hits) >= max_hits:
-                                return {
-                                    "ok": True,
-                                    "engine": "python",
-                                    "query": query,
-                                    "root": root,
-                                    "hits": hits,
-                                    "truncated": True,
-                                }
+                if hs_db is not None:
+                    matches = _iter_lines_hyperscan(entry.path, hs_db)
+                elif needle is not None:
+                    matches = _iter_lines_literal(entry.path, needle, case_sensitive)
+                else:
+                    matches = _iter_lines_pattern(entry.path, pattern)
+                for i, line in matches:
+                    hits.append(
+                        {
+                            "path": entry.path[len(_BASE_PREFIX):].replace(os.sep, "/"),
+                            "line": i,
+                            "text": line.strip(),
+                        }
+                    )
+                    if len(hits) >= max_hits:
+                        return {
+                            "ok": True,
+                            "engine": engine,
+                            "query": query,
+                            "root": root,
+                            "hits": hits,
+                            "truncated": True,
+                        }
             except Exception:
                 continue
 
         return {
             "ok": True,
-            "engine": "python",
+            "engine": engine,
             "query": query,
             "root": root,
             "hits": hits,
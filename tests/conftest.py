@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from intel_fs import server  # noqa: E402
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """Point the server at a fresh BASE_DIR (and AST cache) under tmp_path."""
+    base = (tmp_path / "sandbox").resolve()
+    base.mkdir()
+    monkeypatch.setattr(server, "BASE_DIR", base)
+    monkeypatch.setattr(server, "_BASE_STR", str(base))
+    monkeypatch.setattr(server, "_BASE_PREFIX", str(base) + "/")
+    monkeypatch.setattr(server, "AST_CACHE_PATH", base / ".intel_fs_cache.db")
+    monkeypatch.setattr(server, "_ast_cache_conn", None)
+    yield base
+    if server._ast_cache_conn is not None:
+        server._ast_cache_conn.close()
+
+
+def call(tool, *args, **kwargs):
+    """Call a tool's underlying function (older fastmcp wraps it in a Tool object)."""
+    return getattr(tool, "fn", tool)(*args, **kwargs)
@@ -0,0 +1,357 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+import types
+
+import pytest
+
+from conftest import call
+from intel_fs import server
+
+
+@pytest.fixture(params=["ast", "tree-sitter"])
+def parser_backend(request, monkeypatch):
+    """Run a test against both summarizer backends (tree-sitter only if installed)."""
+    if request.param == "ast":
+        monkeypatch.setattr(server, "_ts_get_parser", None)
+        monkeypatch.setattr(server, "_ts_checked", True)
+    elif not server._load_tree_sitter():
+        pytest.skip("tree_sitter_languages not installed")
+    return request.param
+
+
+def test_ast_cache_files_are_not_listed(sandbox):
+    (sandbox / "app.py").write_text("def main(): pass\n")
+    assert call(server.explain_repository)["ok"]
+    assert (sandbox / ".intel_fs_cache.db").exists()
+
+    assert call(server.list_files)["files"] == ["app.py"]
+    top_level = call(server.explain_repository)["top_level"]
+    assert [e["name"] for e in top_level] == ["app.py"]
+
+
+def test_ast_cache_drops_rows_for_changed_files(sandbox):
+    fp = sandbox / "mod.py"
+    for body in ("def a(): pass\n", "def b(): pass\n", "def c(): pass\n"):
+        fp.write_text(body)
+        assert call(server.explain_repository)["ok"]
+
+    conn = sqlite3.connect(sandbox / ".intel_fs_cache.db")
+    rows = conn.execute("SELECT path FROM ast_cache").fetchall()
+    conn.close()
+    assert rows == [("mod.py",)]
+
+
+def test_ast_cache_opened_once_on_cold_start(sandbox, monkeypatch):
+    for i in range(80):
+        (sandbox / f"m{i}.py").write_text(f"def f{i}(): pass\n")
+
+    connects = []
+    real_connect = sqlite3.connect
+
+    def counting_connect(*args, **kwargs):
+        connects.append(args)
+        return real_connect(*args, **kwargs)
+
+    monkeypatch.setattr(sqlite3, "connect", counting_connect)
+    result = call(server.explain_repository, max_files=80)
+    assert result["python_files_scanned"] == 80
+    assert len(connects) == 1
+
+
+def test_summary_follows_nested_statements_only(parser_backend):
+    src = b"""
+import os
+try:
+    import a
+except ImportError:
+    import b
+else:
+    import c
+finally:
+    import d
+if X:
+    def f(): pass
+else:
+    class C:
+        def method(self): pass
+for i in x:
+    import e
+match y:
+    case 1:
+        import g
+def outer():
+    def inner(): pass
+"""
+    out = server._summarize_python_ast(src)
+    assert out["functions"] == ["f", "outer"]
+    assert out["classes"] == ["C"]
+    assert out["imports"] == ["os", "a", "b", "c", "d", "e", "g"]
+    assert out["error"] is None
+
+
+def test_summary_skips_expression_trees(monkeypatch):
+    monkeypatch.setattr(server, "_ts_get_parser", None)
+    monkeypatch.setattr(server, "_ts_checked", True)  # exercise the ast visitor
+    src = "DATA = [" + ", ".join(f"({i}, 'x')" for i in range(20000)) + "]\ndef f(): pass\n"
+
+    visited = []
+    real_visit = server._Summarizer.visit
+
+    def counting_visit(self, node):
+        visited.append(node)
+        return real_visit(self, node)
+
+    monkeypatch.setattr(server._Summarizer, "visit", counting_visit)
+    out = server._summarize_python_ast(src.encode())
+    assert out["functions"] == ["f"]
+    assert len(visited) < 10
+
+
+def test_truncated_summary_matches_across_backends(parser_backend):
+    src = "".join(f"def f_{i}(x): return x\n" for i in range(2000)).encode()
+    out = server._summarize_python_ast(src[:12000], truncated=True)
+    assert out["functions"] == [f"f_{i}" for i in range(60)]
+    assert out["error"] == "Truncated: only the first 12000 bytes were read"
+
+    # cut inside a class: the incomplete statement is dropped by both backends
+    src = b"import os\nclass A:\n    def m(self):\n        return 1\n"
+    out = server._summarize_python_ast(src[:40], truncated=True)
+    assert (out["imports"], out["classes"], out["functions"]) == (["os"], [], [])
+    assert out["error"].startswith("Truncated")
+
+
+def test_explain_repository_flags_files_cut_by_the_cap(sandbox):
+    (sandbox / "big.py").write_text("def a(): pass\n" * 10)
+    (sandbox / "exact.py").write_text("def b(): pass\n")
+
+    result = call(server.explain_repository, max_chars_per_file=14)
+    structures = {s["path"]: s["structure"] for s in result["file_summaries"]}
+    assert structures["exact.py"] == {"functions": ["b"], "classes": [], "imports": [], "error": None}
+    assert structures["big.py"]["error"].startswith("Truncated")
+
+
+def test_explain_repository_preview(sandbox):
+    lines = [line for i in range(20) for line in (f"def f{i}():", "    pass")]
+    (sandbox / "crlf.py").write_bytes(("\r\n".join(lines) + "\r\n").encode())
+    (sandbox / "short.py").write_bytes(b"x = 1\n")
+
+    result = call(server.explain_repository)
+    previews = {s["path"]: s["preview"] for s in result["file_summaries"]}
+    assert previews["crlf.py"] == "\n".join(lines[:30])  # first 30 lines, no \r
+    assert previews["short.py"] == "x = 1"
+
+
+def test_broken_tree_sitter_install_is_reported(sandbox, monkeypatch, caplog):
+    def get_parser(name):
+        raise TypeError("__init__() takes exactly 1 argument (2 given)")
+
+    fake = types.ModuleType("tree_sitter_languages")
+    fake.get_parser = get_parser
+    monkeypatch.setitem(sys.modules, "tree_sitter_languages", fake)
+    monkeypatch.setattr(server, "_ts_get_parser", None)
+    monkeypatch.setattr(server, "_ts_checked", False)
+    monkeypatch.setattr(server, "_ts_error", None)
+
+    result = call(server.explain_repository)
+    assert result["parser"] == "ast"
+    assert result["parser_error"].startswith("TypeError")
+    assert "tree-sitter unavailable" in caplog.text
+
+
+class _FakeHyperscanDb:
+    """Stands in for a compiled hyperscan database, matching with re."""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def scan(self, data, match_event_handler):
+        for m in self.pattern.finditer(data):
+            match_event_handler(0, 0, m.end(), 0, None)
+
+
+@pytest.fixture
+def no_ripgrep(monkeypatch):
+    monkeypatch.setattr(server.shutil, "which", lambda name: None)
+
+
+def test_ripgrep_stream_stops_at_max_hits(sandbox, tmp_path, monkeypatch):
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    argv_log = tmp_path / "rg-argv.json"
+    rg = bindir / "rg"
+    rg.write_text(
+        f"#!{sys.executable}\n"
+        "import json, sys, time\n"
+        f"json.dump(sys.argv[1:], open({str(argv_log)!r}, 'w'))\n"
+        "for i in range(1, 101):\n"
+        "    print(f'a.txt:{i}:hit {i}', flush=True)\n"
+        "time.sleep(30)\n"
+    )
+    rg.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+
+    procs = []
+    real_popen = server.subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        procs.append(real_popen(*args, **kwargs))
+        return procs[-1]
+
+    monkeypatch.setattr(server.subprocess, "Popen", recording_popen)
+    started = time.monotonic()
+    result = call(server.smart_search, "hit", max_hits=5)
+
+    assert time.monotonic() - started < 10  # didn't wait out the stub's sleep
+    assert result["engine"] == "ripgrep"
+    assert result["truncated"] is True
+    assert [(h["path"], h["line"], h["text"]) for h in result["hits"]] == [
+        ("a.txt", i, f"hit {i}") for i in range(1, 6)
+    ]
+    assert procs[0].returncode is not None  # child was reaped
+    argv = json.loads(argv_log.read_text())
+    assert argv[argv.index("--max-count") + 1] == "5"
+
+
+def test_hyperscan_not_used_for_non_ascii_caseless_literal(sandbox, no_ripgrep, monkeypatch):
+    import re
+
+    (sandbox / "notes.md").write_text("ÉCOLE\nother\n")
+    real_optional_module = server._optional_module
+    monkeypatch.setattr(
+        server, "_optional_module", lambda name: object() if name == "hyperscan" else real_optional_module(name)
+    )
+    monkeypatch.setattr(
+        server,
+        "_hyperscan_db",
+        lambda q, case: _FakeHyperscanDb(re.compile(re.escape(q).encode(), 0 if case else re.I)),
+    )
+
+    ascii_hit = call(server.smart_search, "OTHER")
+    assert ascii_hit["engine"] == "hyperscan"
+    assert [h["line"] for h in ascii_hit["hits"]] == [2]
+
+    result = call(server.smart_search, "école")
+    assert result["engine"] == "python"
+    assert [h["text"] for h in result["hits"]] == ["ÉCOLE"]
+
+
+def test_literal_search_reports_each_line_once(sandbox, no_ripgrep):
+    (sandbox / "a.txt").write_text("foo foo\nbar\nFOO\n")
+    (sandbox / "b.txt").write_text("nothing here\n")
+
+    result = call(server.smart_search, "foo")
+    assert [(h["path"], h["line"], h["text"]) for h in result["hits"]] == [
+        ("a.txt", 1, "foo foo"),
+        ("a.txt", 3, "FOO"),
+    ]
+    sensitive = call(server.smart_search, "foo", case_sensitive=True)
+    assert [h["line"] for h in sensitive["hits"]] == [1]
+
+
+def test_empty_literal_matches_lines_like_the_line_scan(sandbox, no_ripgrep):
+    (sandbox / "a.txt").write_text("one\ntwo\n")
+    (sandbox / "b.txt").write_text("no trailing newline")
+
+    hits = call(server.smart_search, "")["hits"]
+    assert sorted((h["path"], h["line"]) for h in hits) == [("a.txt", 1), ("a.txt", 2), ("b.txt", 1)]
+
+
+def test_summary_tolerates_invalid_utf8(parser_backend):
+    out = server._summarize_python_ast(b'x = "caf\xe9"\ndef f(): pass\n')
+    assert out["functions"] == ["f"]
+    assert out["error"] is None
+
+
+def test_summary_reports_syntax_errors(parser_backend):
+    out = server._summarize_python_ast(b"def f(:\n")
+    assert out["error"]
+
+
+def test_syntax_error_in_valid_utf8_is_parsed_once(monkeypatch):
+    monkeypatch.setattr(server, "_ts_get_parser", None)
+    monkeypatch.setattr(server, "_ts_checked", True)
+
+    calls = []
+    real_parse = server.ast.parse
+
+    def counting_parse(source, *args, **kwargs):
+        calls.append(source)
+        return real_parse(source, *args, **kwargs)
+
+    monkeypatch.setattr(server.ast, "parse", counting_parse)
+    out = server._summarize_python_ast("# café\ndef f(:\n".encode())
+    assert out["error"] == "invalid syntax (<unknown>, line 2)"
+    assert len(calls) == 1
+
+
+def _read_pages(path, max_chars):
+    pages, offset = [], 0
+    for _ in range(1000):
+        result = call(server.read_file, path, max_chars=max_chars, offset=offset)
+        assert result["ok"], result
+        pages.append(result["content"])
+        if not result["truncated"]:
+            return pages
+        assert result["next_offset"] > offset
+        offset = result["next_offset"]
+    raise AssertionError("paging did not terminate")
+
+
+def test_read_file_pages_multibyte_text_without_loss(sandbox):
+    (sandbox / "u.txt").write_text("😀😀中😀😀", encoding="utf-8")
+    assert _read_pages("u.txt", 1) == ["😀", "😀", "中", "😀", "😀"]
+    assert "".join(_read_pages("u.txt", 2)) == "😀😀中😀😀"
+
+
+def test_read_file_pages_invalid_bytes_without_duplicates(sandbox):
+    (sandbox / "l.txt").write_bytes(b"ab\xe9cd\xe9ef\xe9gh\xe9ij")
+    assert _read_pages("l.txt", 2) == ["ab", "cd", "ef", "gh", "ij"]
+
+
+def test_read_file_single_read_matches_paged(sandbox):
+    text = "héllo wörld ☃ end\n" * 50
+    (sandbox / "t.txt").write_text(text, encoding="utf-8")
+    whole = call(server.read_file, "t.txt")
+    assert whole["content"] == text and not whole["truncated"]
+    assert "".join(_read_pages("t.txt", 7)) == text
+
+
+def test_read_file_rejects_non_positive_max_chars(sandbox):
+    (sandbox / "a.txt").write_text("abc")
+    for max_chars in (0, -5):
+        result = call(server.read_file, "a.txt", max_chars=max_chars)
+        assert result["ok"] is False
+        assert result["error"] == "InvalidArgument"
+
+
+def test_read_file_rejects_parent_traversal(sandbox):
+    (sandbox.parent / "secret.txt").write_text("TOPSECRET")
+    result = call(server.read_file, "../secret.txt")
+    assert result["error"] == "SecurityError"
+    assert call(server.list_files, "src/../..")["error"] == "SecurityError"
+
+
+def test_read_file_rejects_symlink_out_of_sandbox(sandbox):
+    secret = sandbox.parent / "secret"
+    secret.mkdir()
+    (secret / "s.txt").write_text("TOPSECRET")
+    (sandbox / "docs").symlink_to(secret)
+
+    assert call(server.read_file, "docs/s.txt")["error"] == "SecurityError"
+
+
+def test_symlink_created_after_first_lookup_is_rejected(sandbox):
+    secret = sandbox.parent / "secret"
+    secret.mkdir()
+    (secret / "s.txt").write_text("TOPSECRET")
+
+    # first lookup while docs/ doesn't exist yet
+    assert call(server.read_file, "docs/s.txt")["error"] == "NotFound"
+
+    (sandbox / "docs").symlink_to(secret)
+    result = call(server.read_file, "docs/s.txt")
+    assert result["error"] == "SecurityError"
+    assert "TOPSECRET" not in str(result)